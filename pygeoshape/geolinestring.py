@@ -1,10 +1,18 @@
 from typing import List
+from functools import cached_property
+import shapely
 from shapely.geometry import LineString
-from pyproj import Transformer
 import numpy as np
-import numba as nb
-import matplotlib.pyplot as plt
-from pygeoshape.utils import fast_intersection_append
+from pygeoshape.utils import (
+    intersect_3d_linestrings,
+    intersect_3d_segment_pairs,
+    linestrings_intersect_3d,
+    segment_pairs_intersect_3d,
+    unique_rows,
+    _get_transformer,
+    coordinate_tolerance,
+    MIN_TREE_SEGMENTS,
+)
 
 
 class GeoLineString:
@@ -16,6 +24,7 @@ class GeoLineString:
         epsg_proj: str = "epsg:2163",
         epsg_from: str = "epsg:4326",
         is_xy: bool = False,
+        dtype: np.dtype = np.float64,
     ):
         """
         Args:
@@ -25,6 +34,7 @@ class GeoLineString:
         epsg_proj (str): EPSG code to transform longitude, latitude into x, y (default: 2163)
         epsg_from (str): EPSG code to transform longitude, latitude from (default: 4326)
         is_xy (bool): Boolean for if the input coordinates are already in (x, y, [z]) format
+        dtype (np.dtype): Floating point type used to store the x, y, [z] coordinates (default: np.float64)
 
         """
         # coords should contain [[lon1, lat1, alt1],[lon2,...]]
@@ -34,9 +44,9 @@ class GeoLineString:
         self.epsg_proj = epsg_proj
         self.epsg_from = epsg_from
         self.is_xy = is_xy
-        self.transformer = Transformer.from_crs(
-            self.epsg_from, self.epsg_proj, always_xy=True
-        )
+        self.dtype = np.dtype(dtype)
+        self.transformer = _get_transformer(self.epsg_from, self.epsg_proj)
+        self.inverse_transformer = _get_transformer(self.epsg_proj, self.epsg_from)
 
         # convert input coordinates to X, Y
         if not self.is_xy:
@@ -45,30 +55,76 @@ class GeoLineString:
         else:
             self.xy_coords = self.coords
 
-        self.np_coords = np.array(self.xy_coords)
-        self.length = self.geolinestring_length()
-        self.dimensions = len(self.xy_coords[0])
+        # coordinates are stored per axis so numeric work runs over
+        # contiguous columns; the projection itself is always done in float64
+        arr = np.asarray(self.xy_coords, dtype=self.dtype)
 
-        # need linestring for each dimension
-        # x, y, [z]
-        # x, z, [y]
-        # y, z, [x]
+        # 2D inputs are handled as 3D with z = 0, only the output of
+        # intersection is reduced back to x, y
+        self._was_2d = arr.shape[1] == 2
+        if self._was_2d:
+            arr = np.column_stack([arr, np.zeros(len(arr), dtype=arr.dtype)])
 
-        if self.dimensions == 2:
-            self.xy = LineString([(coord[0], coord[1])
-                                 for coord in self.xy_coords])
+        self._x = arr[:, 0].copy()
+        self._y = arr[:, 1].copy()
+        self._z = arr[:, 2].copy()
 
-        if self.dimensions == 3:
+        self.length = self.geolinestring_length()
+        self.dimensions = 2 if self._was_2d else 3
 
-            self.xy = LineString(
-                [(coord[0], coord[1], coord[2]) for coord in self.xy_coords]
-            )
-            self.xz = LineString(
-                [(coord[0], coord[2], coord[1]) for coord in self.xy_coords]
-            )
-            self.yz = LineString(
-                [(coord[1], coord[2], coord[0]) for coord in self.xy_coords]
+        # intersections are tested to within the resolution of dtype
+        self.eps = coordinate_tolerance(arr)
+
+    @cached_property
+    def np_coords(self):
+        """
+        Coordinates of the GeoLineString as an (N, 3) array of dtype,
+        stacked from the per-axis arrays on first access
+
+        """
+        return np.column_stack([self._x, self._y, self._z])
+
+    # need linestring for each dimension, built on first use
+    # x, y, [z]
+    # x, z, [y]
+    # y, z, [x]
+
+    @cached_property
+    def xy(self):
+        return LineString(self.np_coords)
+
+    @cached_property
+    def xz(self):
+        return LineString(self.np_coords[:, [0, 2, 1]])
+
+    @cached_property
+    def yz(self):
+        return LineString(self.np_coords[:, [1, 2, 0]])
+
+    # axis-aligned bounding boxes of each segment, indexed by an STRtree
+    # over their xy extents once there are enough segments to benefit
+
+    @cached_property
+    def segment_mins(self):
+        return np.minimum(self.np_coords[:-1], self.np_coords[1:])
+
+    @cached_property
+    def segment_maxs(self):
+        return np.maximum(self.np_coords[:-1], self.np_coords[1:])
+
+    @cached_property
+    def segment_tree(self):
+        if len(self.segment_mins) < MIN_TREE_SEGMENTS:
+            return None
+
+        return shapely.STRtree(
+            shapely.box(
+                self.segment_mins[:, 0] - self.eps,
+                self.segment_mins[:, 1] - self.eps,
+                self.segment_maxs[:, 0] + self.eps,
+                self.segment_maxs[:, 1] + self.eps,
             )
+        )
 
     def geolinestring_length(self):
         """
@@ -83,8 +139,9 @@ class GeoLineString:
 
         # sqrt( (x2-x1)^2 + (y2-y1)^2 + (z2-z1)^2)
         # then take sum for each segment for total distance
-        length = np.sum(
-            np.sqrt(np.sum(np.square(np.diff(self.np_coords, axis=0)), axis=1)))
+        length = np.sqrt(
+            np.diff(self._x) ** 2 + np.diff(self._y) ** 2 + np.diff(self._z) ** 2
+        ).sum()
         return length
 
     def project_coords(self):
@@ -94,16 +151,17 @@ class GeoLineString:
 
         Returns:
         -------
-        xy_coords (List): List of coordinates in (X, Y, [Z])
+        xy_coords (np.ndarray): Array of coordinates in (X, Y, [Z])
 
         """
-        xy_coords = []
-        for coordinate in self.coords:
-            x, y = self.transformer.transform(coordinate[0], coordinate[1])
-            if len(coordinate) > 2:
-                xy_coords.append((x, y, coordinate[2]))
-            else:
-                xy_coords.append((x, y))
+        # transform all coordinates in a single call rather than per point
+        arr = np.asarray(self.coords, dtype=np.float64)
+        x, y = self.transformer.transform(arr[:, 0], arr[:, 1])
+
+        if arr.shape[1] == 3:
+            xy_coords = np.column_stack([x, y, arr[:, 2]])
+        else:
+            xy_coords = np.column_stack([x, y])
 
         return xy_coords
 
@@ -124,25 +182,23 @@ class GeoLineString:
 
         """
 
+        import matplotlib.pyplot as plt
+
         fig = plt.figure()
         ax = fig.add_subplot(111, projection="3d")
-        ax.plot(self.np_coords[:, 0],
-                self.np_coords[:, 1], self.np_coords[:, 2])
+        ax.plot(*self.np_coords.T)
 
         if geo_obj is not None:
-            ax.plot(
-                geo_obj.np_coords[:, 0],
-                geo_obj.np_coords[:, 1],
-                geo_obj.np_coords[:, 2],
-            )
+            ax.plot(*geo_obj.np_coords.T)
         ax.set_xlabel("x", fontsize=label_fontsize)
         ax.set_ylabel("y", fontsize=label_fontsize)
         ax.set_zlabel("z", fontsize=label_fontsize)
         return fig, ax
 
-    def intersects(self, geo_obj):
+    def candidate_segments(self, geo_obj):
         """
-        Determines if the GeoLineString intersects with geo_obj
+        Determines which pairs of segments from the GeoLineString and geo_obj
+        have overlapping bounding boxes
 
         Args:
         ----
@@ -150,90 +206,145 @@ class GeoLineString:
 
         Returns:
         -------
-        bool: True if GeoLineStrings intersect, False otherwise
+        idx_self (np.ndarray): Segment indices into the GeoLineString
+        idx_other (np.ndarray): Segment indices into geo_obj
 
         """
-        intersection_points = self.intersection(geo_obj)
 
-        if len(intersection_points) > 0:
-            return True
-        else:
-            return False
+        # the tree boxes are padded by self.eps, pad the query by geo_obj.eps
+        idx_other, idx_self = self.segment_tree.query(
+            shapely.box(
+                geo_obj.segment_mins[:, 0] - geo_obj.eps,
+                geo_obj.segment_mins[:, 1] - geo_obj.eps,
+                geo_obj.segment_maxs[:, 0] + geo_obj.eps,
+                geo_obj.segment_maxs[:, 1] + geo_obj.eps,
+            )
+        )
 
-    def intersection(self, geo_obj, lonlat=False):
+        # the tree only covers x, y so filter the remaining pairs on z
+        pad = self.eps + geo_obj.eps
+        z_overlap = (
+            self.segment_mins[idx_self, 2] <= geo_obj.segment_maxs[idx_other, 2] + pad
+        ) & (
+            self.segment_maxs[idx_self, 2] >= geo_obj.segment_mins[idx_other, 2] - pad
+        )
+        return idx_self[z_overlap], idx_other[z_overlap]
+
+    def intersection_points(self, geo_obj):
         """
-        Determines where the GeoLineString intersects with geo_obj
+        Determines the raw intersection points with geo_obj, which may
+        contain duplicates where the GeoLineStrings meet at a vertex
 
         Args:
         ----
-        geo_obj (GeoLineString): Second GeoLineString for comparison
-        lonlat (bool): Format of output coordinates. True returns the coordinates in longitude, latitude. False returns coordinates in x, y
+        geo_obj (GeoLineString or GeoPoint): Second geo_obj for comparison
 
         Returns:
         -------
-        intersection (List): Intersection coordinates
+        intersection (np.ndarray): Intersection coordinates
 
         """
 
-        intersection = nb.typed.List.empty_list(
-            nb.types.UniTuple(nb.float64, self.dimensions))
+        # imported here since geopoint imports this module
+        from pygeoshape.geopoint import GeoPoint
 
-        inter1 = self.xy.intersection(geo_obj.xy)
-        inter2 = self.xz.intersection(geo_obj.xz)
-        inter3 = self.yz.intersection(geo_obj.yz)
+        eps = max(self.eps, geo_obj.eps)
 
-        if not hasattr(inter1, "geoms"):
-            xy = np.array(inter1.coords)[0]
-            n_xy_intersections = 1
+        if isinstance(geo_obj, GeoPoint):
+            if geo_obj._point_on_linestring_3d(self.np_coords, eps):
+                return geo_obj.np_coords.reshape(1, 3)
+            return np.empty((0, 3))
 
-        else:
-            n_xy_intersections = len(inter1.geoms)
+        if self.segment_tree is None:
+            return intersect_3d_linestrings(self.np_coords, geo_obj.np_coords, eps)
 
-        if not hasattr(inter2, "geoms"):
-            xz = np.array(inter2.coords)[0]
-            n_xz_intersections = 1
-        else:
-            n_xz_intersections = len(inter2.geoms)
+        idx_self, idx_other = self.candidate_segments(geo_obj)
+        return intersect_3d_segment_pairs(
+            self.np_coords, geo_obj.np_coords, idx_self, idx_other, eps
+        )
 
-        if not hasattr(inter3, "geoms"):
-            yz = np.array(inter3.coords)[0]
-            n_yz_intersections = 1
-        else:
-            n_yz_intersections = len(inter3.geoms)
+    def intersects(self, geo_obj):
+        """
+        Determines if the GeoLineString intersects with geo_obj
 
-        for i in range(n_xy_intersections):
+        Args:
+        ----
+        geo_obj (GeoLineString or GeoPoint): Second geo_obj for comparison
 
-            for j in range(n_xz_intersections):
+        Returns:
+        -------
+        bool: True if GeoLineStrings intersect, False otherwise
 
-                for k in range(n_yz_intersections):
+        """
+        # imported here since geopoint imports this module
+        from pygeoshape.geopoint import GeoPoint
 
-                    if hasattr(inter1, "geoms"):
-                        xy = np.array(inter1.geoms[i].coords)
-                    else:
-                        xy = np.array(inter1.coords)
+        eps = max(self.eps, geo_obj.eps)
 
-                    if hasattr(inter2, "geoms"):
-                        xz = np.array(inter2.geoms[j].coords)
-                    else:
-                        xz = np.array(inter2.coords)
+        if isinstance(geo_obj, GeoPoint):
+            return geo_obj._point_on_linestring_3d(self.np_coords, eps)
 
-                    if hasattr(inter3, "geoms"):
-                        yz = np.array(inter3.geoms[k].coords)
-                    else:
-                        yz = np.array(inter3.coords)
+        if self.segment_tree is None:
+            return linestrings_intersect_3d(self.np_coords, geo_obj.np_coords, eps)
+
+        idx_self, idx_other = self.candidate_segments(geo_obj)
+        return segment_pairs_intersect_3d(
+            self.np_coords, geo_obj.np_coords, idx_self, idx_other, eps
+        )
+
+    def intersects_many(self, geo_objs: List):
+        """
+        Determines which of geo_objs the GeoLineString intersects with
+
+        Args:
+        ----
+        geo_objs (List): GeoLineStrings for comparison
+
+        Returns:
+        -------
+        np.ndarray: Boolean array, True where the GeoLineStrings intersect
+
+        """
 
-                    fast_intersection_append(xy, xz, yz, intersection)
+        # two linestrings can only intersect in 3D if each of their axis
+        # projections do, which shapely checks for all of geo_objs at once
+        eps = np.maximum(self.eps, [geo_obj.eps for geo_obj in geo_objs])
+        candidates = np.ones(len(geo_objs), dtype=bool)
+        for axes in ("xy", "xz", "yz"):
+            others = np.array([getattr(geo_obj, axes) for geo_obj in geo_objs])
+            candidates &= shapely.dwithin(getattr(self, axes), others, eps)
 
-            intersection = np.unique(intersection, axis=0)
+        result = np.zeros(len(geo_objs), dtype=bool)
+        for idx in np.flatnonzero(candidates):
+            result[idx] = self.intersects(geo_objs[idx])
+        return result
+
+    def intersection(self, geo_obj, lonlat=False):
+        """
+        Determines where the GeoLineString intersects with geo_obj
+
+        Args:
+        ----
+        geo_obj (GeoLineString or GeoPoint): Second geo_obj for comparison
+        lonlat (bool): Format of output coordinates. True returns the coordinates in longitude, latitude. False returns coordinates in x, y
+
+        Returns:
+        -------
+        intersection (np.ndarray): Intersection coordinates
+
+        """
+
+        intersection = self.intersection_points(geo_obj)
+        intersection = unique_rows(intersection)
+
+        if lonlat:
+            lon, lat, alt = self.inverse_transformer.transform(
+                intersection[:, 0],
+                intersection[:, 1],
+                intersection[:, 2],
+            )
+            intersection = np.column_stack([lon, lat, alt])
 
-            if lonlat:
-                lon, lat, alt = self.transformer.transform(
-                    intersection[:, 0],
-                    intersection[:, 1],
-                    intersection[:, 2],
-                    direction="INVERSE",
-                )
-                intersection = np.array(
-                    [[lon[i], lat[i], alt[i]] for i in range(len(lon))]
-                )
-            return intersection
+        if self._was_2d:
+            intersection = intersection[:, :2]
+        return intersection
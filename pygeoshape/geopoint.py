@@ -1,10 +1,14 @@
 from typing import List
+import shapely
 from shapely.geometry import Point
-from pyproj import Transformer
 import numpy as np
-import numba as nb
-import matplotlib.pyplot as plt
-from pygeoshape.utils import fast_intersection_append
+from pygeoshape.geolinestring import GeoLineString
+from pygeoshape.utils import (
+    fast_intersection_append,
+    unique_rows,
+    coordinate_tolerance,
+    _get_transformer,
+)
 
 
 class GeoPoint:
@@ -34,9 +38,8 @@ class GeoPoint:
         self.epsg_proj = epsg_proj
         self.epsg_from = epsg_from
         self.is_xy = is_xy
-        self.transformer = Transformer.from_crs(
-            self.epsg_from, self.epsg_proj, always_xy=True
-        )
+        self.transformer = _get_transformer(self.epsg_from, self.epsg_proj)
+        self.inverse_transformer = _get_transformer(self.epsg_proj, self.epsg_from)
 
         # convert input coordinates to X, Y
         if not self.is_xy:
@@ -45,25 +48,24 @@ class GeoPoint:
         else:
             self.xy_coords = self.coordinate
 
-        self.np_coords = np.array(self.xy_coords)
-        self.dimensions = len(self.xy_coords)
+        self.np_coords = np.asarray(self.xy_coords, dtype=np.float64)
+
+        # 2D inputs are handled as 3D with z = 0, only the output of
+        # intersection is reduced back to x, y
+        self._was_2d = len(self.np_coords) == 2
+        if self._was_2d:
+            self.np_coords = np.append(self.np_coords, 0.0)
+        self.dimensions = 2 if self._was_2d else 3
+        self.eps = coordinate_tolerance(self.np_coords)
 
-        # need linestring for each dimension
+        # need point for each dimension
         # x, y, [z]
         # x, z, [y]
         # y, z, [x]
 
-        if self.dimensions == 2:
-            self.xy = Point((self.xy_coords[0], self.xy_coords[1]))
-
-        if self.dimensions == 3:
-
-            self.xy = Point(
-                (self.xy_coords[0], self.xy_coords[1], self.xy_coords[2]))
-            self.xz = Point(
-                (self.xy_coords[0], self.xy_coords[2], self.xy_coords[1]))
-            self.yz = Point(
-                (self.xy_coords[1], self.xy_coords[2], self.xy_coords[0]))
+        self.xy = Point(self.np_coords)
+        self.xz = Point(self.np_coords[[0, 2, 1]])
+        self.yz = Point(self.np_coords[[1, 2, 0]])
 
     def project_coords(self):
         """
@@ -72,16 +74,16 @@ class GeoPoint:
 
         Returns:
         -------
-        xy_coords (List): List of coordinates in (X, Y, [Z])
+        xy_coords (np.ndarray): Coordinate in (X, Y, [Z])
 
         """
-        xy_coords = []
-        for coordinate in self.coordinate:
-            x, y = self.transformer.transform(coordinate[0], coordinate[1])
-            if len(coordinate) > 2:
-                xy_coords.append((x, y, coordinate[2]))
-            else:
-                xy_coords.append((x, y))
+        arr = np.asarray(self.coordinate, dtype=np.float64)
+        x, y = self.transformer.transform(arr[0], arr[1])
+
+        if arr.shape[0] == 3:
+            xy_coords = np.array([x, y, arr[2]])
+        else:
+            xy_coords = np.array([x, y])
 
         return xy_coords
 
@@ -102,17 +104,14 @@ class GeoPoint:
 
         """
 
+        import matplotlib.pyplot as plt
+
         fig = plt.figure()
         ax = fig.add_subplot(111, projection="3d")
-        ax.plot(self.np_coords[:, 0],
-                self.np_coords[:, 1], self.np_coords[:, 2])
+        ax.plot(*np.atleast_2d(self.np_coords).T)
 
         if geo_obj is not None:
-            ax.plot(
-                geo_obj.np_coords[:, 0],
-                geo_obj.np_coords[:, 1],
-                geo_obj.np_coords[:, 2],
-            )
+            ax.plot(*geo_obj.np_coords.T)
         ax.set_xlabel("x", fontsize=label_fontsize)
         ax.set_ylabel("y", fontsize=label_fontsize)
         ax.set_zlabel("z", fontsize=label_fontsize)
@@ -131,6 +130,10 @@ class GeoPoint:
         bool: True if GeoLineStrings intersect, False otherwise
 
         """
+        if isinstance(geo_obj, GeoLineString):
+            return self._point_on_linestring_3d(
+                geo_obj.np_coords, max(self.eps, geo_obj.eps))
+
         intersection_points = self.intersection(geo_obj)
 
         if len(intersection_points) > 0:
@@ -149,69 +152,119 @@ class GeoPoint:
 
         Returns:
         -------
-        intersection (List): Intersection coordinates
+        intersection (np.ndarray): Intersection coordinates
 
         """
 
-        intersection = nb.typed.List.empty_list(
-            nb.types.UniTuple(nb.float64, self.dimensions))
+        if isinstance(geo_obj, GeoLineString):
+            if self._point_on_linestring_3d(
+                    geo_obj.np_coords, max(self.eps, geo_obj.eps)):
+                intersection = self.np_coords.reshape(1, 3)
+            else:
+                intersection = np.empty((0, 3))
+        else:
+            intersection = self._projection_intersection(geo_obj)
 
-        inter1 = self.xy.intersection(geo_obj.xy)
-        inter2 = self.xz.intersection(geo_obj.xz)
-        inter3 = self.yz.intersection(geo_obj.yz)
+        if lonlat:
+            lon, lat, alt = self.inverse_transformer.transform(
+                intersection[:, 0],
+                intersection[:, 1],
+                intersection[:, 2],
+            )
+            intersection = np.column_stack([lon, lat, alt])
 
-        if not hasattr(inter1, "geoms"):
-            xy = np.array(inter1.coords)[0]
-            n_xy_intersections = 1
+        if self._was_2d:
+            intersection = intersection[:, :2]
+        return intersection
 
-        else:
-            n_xy_intersections = len(inter1.geoms)
+    def _point_on_linestring_3d(self, arr, eps):
+        """
+        Determines if the GeoPoint lies on any segment of the linestring arr
 
-        if not hasattr(inter2, "geoms"):
-            xz = np.array(inter2.coords)[0]
-            n_xz_intersections = 1
-        else:
-            n_xz_intersections = len(inter2.geoms)
+        Args:
+        ----
+        arr (np.ndarray): (N, 3) linestring coordinates in (x, y, z)
+        eps (float): Distance within which the GeoPoint is on a segment
 
-        if not hasattr(inter3, "geoms"):
-            yz = np.array(inter3.coords)[0]
-            n_yz_intersections = 1
-        else:
-            n_yz_intersections = len(inter3.geoms)
+        Returns:
+        -------
+        bool: True if the GeoPoint is within eps of a segment, False otherwise
 
-        for i in range(n_xy_intersections):
+        """
+
+        a = arr[:-1]
+        b = arr[1:]
+        ab = b - a
+        ap = self.np_coords - a
+        bp = self.np_coords - b
+
+        # distance to the line through each segment, only counted where the
+        # point projects between the segment's endpoints
+        seg_lengths = np.linalg.norm(ab, axis=1)
+        line_dists = np.linalg.norm(np.cross(ap, bp), axis=1)
+        between = (np.einsum("ij,ij->i", ap, ab) >= 0) & (
+            np.einsum("ij,ij->i", bp, ab) <= 0
+        )
+        on_segment = between & (line_dists < eps * seg_lengths)
+
+        # vertices cover the segment ends and zero length segments
+        on_vertex = np.linalg.norm(arr - self.np_coords, axis=1) < eps
+
+        return bool(on_segment.any() or on_vertex.any())
+
+    @staticmethod
+    def _coord_arrays(geom):
+        """
+        Converts the coordinates of geom, or of each of its parts for multi
+        geometries, into (k, 3) arrays
+
+        """
+        if hasattr(geom, "geoms"):
+            return [np.asarray(part.coords).reshape(-1, 3) for part in geom.geoms]
+        return [np.asarray(geom.coords).reshape(-1, 3)]
 
-            for j in range(n_xz_intersections):
+    def _projection_intersection(self, geo_obj):
+        """
+        Determines where the GeoPoint intersects with geo_obj by matching the
+        intersections of their xy, xz and yz projections
 
-                for k in range(n_yz_intersections):
+        Args:
+        ----
+        geo_obj (GeoPoint): Second GeoPoint for comparison
 
-                    if hasattr(inter1, "geoms"):
-                        xy = np.array(inter1.geoms[i].coords)
-                    else:
-                        xy = np.array(inter1.coords)
+        Returns:
+        -------
+        intersection (np.ndarray): Intersection coordinates in (x, y, z)
+
+        """
+
+        inter1 = self.xy.intersection(geo_obj.xy)
+        inter2 = self.xz.intersection(geo_obj.xz)
+        inter3 = self.yz.intersection(geo_obj.yz)
+
+        # convert each intersection geometry's coordinates once, rather than
+        # on every iteration of the loops below
+        xy_arrs = self._coord_arrays(inter1)
+        xz_arrs = self._coord_arrays(inter2)
+        yz_arrs = self._coord_arrays(inter3)
+
+        # each call matches at most len(xy) * len(xz) points
+        out = np.empty(
+            (
+                shapely.get_num_coordinates(inter1)
+                * shapely.get_num_coordinates(inter2)
+                * len(yz_arrs),
+                3,
+            )
+        )
+        count = np.zeros(1, dtype=np.int64)
 
-                    if hasattr(inter2, "geoms"):
-                        xz = np.array(inter2.geoms[j].coords)
-                    else:
-                        xz = np.array(inter2.coords)
+        for xy in xy_arrs:
 
-                    if hasattr(inter3, "geoms"):
-                        yz = np.array(inter3.geoms[k].coords)
-                    else:
-                        yz = np.array(inter3.coords)
+            for xz in xz_arrs:
 
-                    fast_intersection_append(xy, xz, yz, intersection)
+                for yz in yz_arrs:
 
-            intersection = np.unique(intersection, axis=0)
+                    fast_intersection_append(xy, xz, yz, out, count)
 
-            if lonlat:
-                lon, lat, alt = self.transformer.transform(
-                    intersection[:, 0],
-                    intersection[:, 1],
-                    intersection[:, 2],
-                    direction="INVERSE",
-                )
-                intersection = np.array(
-                    [[lon[i], lat[i], alt[i]] for i in range(len(lon))]
-                )
-            return intersection
+        return unique_rows(out[: count[0]])
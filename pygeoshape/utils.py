@@ -1,27 +1,319 @@
+from functools import lru_cache
+from pyproj import Transformer
 import numba as nb
 import numpy as np
 
+# distance (in projected units) below which two segments are considered to
+# intersect
+EPS = 1e-6
 
-@nb.njit
-def fast_intersection_append(xy, xz, yz, intersection):
+# below this many segments a brute force pass beats building/querying an
+# STRtree over the segment envelopes
+MIN_TREE_SEGMENTS = 32
 
-    for ii in range(len(xy)):
+# above this many rows np.unique's sort outperforms hashing each row
+MAX_HASH_UNIQUE_ROWS = 32
 
-        x, y_check, _ = xy[ii]
+_float_list = nb.types.ListType(nb.types.float64)
 
-        idx = np.where(xz[:, 0] == x)[0]
 
-        if len(idx) > 0:
+@lru_cache(maxsize=None)
+def _get_transformer(epsg_from, epsg_proj):
+    """
+    Returns a Transformer from epsg_from to epsg_proj, creating it only once
+    for each pair of EPSG codes since Transformer construction is expensive.
+    """
+    return Transformer.from_crs(epsg_from, epsg_proj, always_xy=True)
 
-            for jj in range(len(idx)):
 
-                z = xz[idx[jj], 1]
+def coordinate_tolerance(coords):
+    """
+    Returns the intersection tolerance for the array coords: EPS, or the
+    storage resolution of its dtype at the largest coordinate magnitude when
+    that is coarser (e.g. ~0.1 m for float32 at projected magnitudes).
+    """
+    return max(EPS, float(np.finfo(coords.dtype).eps * np.abs(coords).max()))
 
-                yz_idx = np.where(yz[:, 1] == z)[0]
 
-                if len(yz_idx) > 0:
+def unique_rows(points):
+    """
+    Removes duplicate rows from the (k, d) array points, returning them
+    sorted lexicographically like np.unique. Small arrays are deduplicated
+    through a dict and then sorted, which is cheaper than np.unique's
+    structured sort at that size.
+    """
 
-                    y = yz[yz_idx, 0]
+    if len(points) > MAX_HASH_UNIQUE_ROWS:
+        return np.unique(points, axis=0)
 
-                    if y_check in y:
-                        intersection.append((x, y_check, z))
+    rows = np.array(list(dict.fromkeys(map(tuple, points))), dtype=points.dtype)
+    rows = rows.reshape(-1, points.shape[1])
+    return rows[np.lexsort(rows.T[::-1])]
+
+
+@nb.njit(
+    "void(float64[:, :], float64[:, :], float64[:, :], float64[:, :], int64[:])",
+    parallel=True,
+    cache=True,
+)
+def fast_intersection_append(xy, xz, yz, out, count):
+    """
+    Appends the points matched across the xy, xz and yz projections to out,
+    starting at row count[0], and advances count[0] past them. out must have
+    room for len(xy) * len(xz) more rows.
+    """
+
+    # z values of the xz projection keyed by x, and (y, z) pairs from the
+    # yz projection, so each xy point is matched with hash lookups
+    xz_by_x = nb.typed.Dict.empty(key_type=nb.types.float64, value_type=_float_list)
+    for jj in range(len(xz)):
+        x = xz[jj, 0]
+        if x not in xz_by_x:
+            xz_by_x[x] = nb.typed.List.empty_list(nb.types.float64)
+        xz_by_x[x].append(xz[jj, 1])
+
+    yz_pairs = set()
+    for kk in range(len(yz)):
+        yz_pairs.add((yz[kk, 0], yz[kk, 1]))
+
+    # count the matches for each xy point, then write them out at their
+    # offsets, so the points can be processed in parallel
+    counts = np.zeros(len(xy), dtype=np.int64)
+
+    for ii in nb.prange(len(xy)):
+
+        x, y_check = xy[ii, 0], xy[ii, 1]
+
+        if x in xz_by_x:
+
+            for z in xz_by_x[x]:
+
+                if (y_check, z) in yz_pairs:
+                    counts[ii] += 1
+
+    offsets = np.zeros(len(xy) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)
+    offsets += count[0]
+
+    for ii in nb.prange(len(xy)):
+
+        x, y_check = xy[ii, 0], xy[ii, 1]
+        idx = offsets[ii]
+
+        if x in xz_by_x:
+
+            for z in xz_by_x[x]:
+
+                if (y_check, z) in yz_pairs:
+                    out[idx, 0] = x
+                    out[idx, 1] = y_check
+                    out[idx, 2] = z
+                    idx += 1
+
+    count[0] = offsets[-1]
+
+
+@nb.njit(cache=True)
+def _point_segment_distance(px, py, pz, ax, ay, az, bx, by, bz):
+
+    abx, aby, abz = bx - ax, by - ay, bz - az
+    denom = abx * abx + aby * aby + abz * abz
+
+    t = 0.0
+    if denom > 0.0:
+        t = ((px - ax) * abx + (py - ay) * aby + (pz - az) * abz) / denom
+        t = min(max(t, 0.0), 1.0)
+
+    dx = px - (ax + t * abx)
+    dy = py - (ay + t * aby)
+    dz = pz - (az + t * abz)
+    return np.sqrt(dx * dx + dy * dy + dz * dz)
+
+
+@nb.njit(cache=True)
+def _segment_intersection(a0, a1, b0, b1, eps, out):
+    """
+    Intersects the 3D segments a0-a1 and b0-b1, writing up to two
+    intersection points into out and returning how many were written.
+    """
+
+    # always do the arithmetic in double precision, whatever the storage
+    # dtype of the coordinates
+    p0 = (np.float64(a0[0]), np.float64(a0[1]), np.float64(a0[2]))
+    p1 = (np.float64(a1[0]), np.float64(a1[1]), np.float64(a1[2]))
+    q0 = (np.float64(b0[0]), np.float64(b0[1]), np.float64(b0[2]))
+    q1 = (np.float64(b1[0]), np.float64(b1[1]), np.float64(b1[2]))
+
+    d1x, d1y, d1z = p1[0] - p0[0], p1[1] - p0[1], p1[2] - p0[2]
+    d2x, d2y, d2z = q1[0] - q0[0], q1[1] - q0[1], q1[2] - q0[2]
+    rx, ry, rz = p0[0] - q0[0], p0[1] - q0[1], p0[2] - q0[2]
+
+    a = d1x * d1x + d1y * d1y + d1z * d1z
+    e = d2x * d2x + d2y * d2y + d2z * d2z
+    b = d1x * d2x + d1y * d2y + d1z * d2z
+    c = d1x * rx + d1y * ry + d1z * rz
+    f = d2x * rx + d2y * ry + d2z * rz
+
+    # |d1 x d2|^2 equals a * e - b * b, but computing it from the cross
+    # product keeps its precision when the segments are nearly parallel
+    nx = d1y * d2z - d1z * d2y
+    ny = d1z * d2x - d1x * d2z
+    nz = d1x * d2y - d1y * d2x
+    denom = nx * nx + ny * ny + nz * nz
+
+    # (nearly) parallel or degenerate segments: overlaps are made up of the
+    # endpoints of one segment that lie on the other
+    if a == 0.0 or e == 0.0 or denom <= 1e-12 * a * e:
+        n = 0
+        for pt, s0, s1 in ((p0, q0, q1), (p1, q0, q1), (q0, p0, p1), (q1, p0, p1)):
+            if n == 2:
+                break
+            dist = _point_segment_distance(
+                pt[0], pt[1], pt[2], s0[0], s0[1], s0[2], s1[0], s1[1], s1[2]
+            )
+            if dist >= eps:
+                continue
+            if n == 1:
+                dx = pt[0] - np.float64(out[0, 0])
+                dy = pt[1] - np.float64(out[0, 1])
+                dz = pt[2] - np.float64(out[0, 2])
+                if np.sqrt(dx * dx + dy * dy + dz * dz) < eps:
+                    continue
+            out[n, 0], out[n, 1], out[n, 2] = pt[0], pt[1], pt[2]
+            n += 1
+
+        # exactly parallel or degenerate segments cannot meet anywhere else,
+        # but a shallow crossing away from the endpoints still needs the
+        # closest point solve below
+        if n > 0 or a == 0.0 or e == 0.0 or denom == 0.0:
+            return n
+
+    # closest points between the two lines, clamped to the segments, with
+    # s = ((q0 - p0) x d2) . n / |n|^2 for n = d1 x d2
+    wx = rz * d2y - ry * d2z
+    wy = rx * d2z - rz * d2x
+    wz = ry * d2x - rx * d2y
+    s = min(max((wx * nx + wy * ny + wz * nz) / denom, 0.0), 1.0)
+    t = (b * s + f) / e
+
+    if t < 0.0:
+        t = 0.0
+        s = min(max(-c / a, 0.0), 1.0)
+    elif t > 1.0:
+        t = 1.0
+        s = min(max((b - c) / a, 0.0), 1.0)
+
+    c1x, c1y, c1z = p0[0] + s * d1x, p0[1] + s * d1y, p0[2] + s * d1z
+    dx = c1x - (q0[0] + t * d2x)
+    dy = c1y - (q0[1] + t * d2y)
+    dz = c1z - (q0[2] + t * d2z)
+
+    if np.sqrt(dx * dx + dy * dy + dz * dz) >= eps:
+        return 0
+
+    # snap to vertices so that neighbouring segment pairs report identical
+    # points
+    for vertex in (p0, p1, q0, q1):
+        dx, dy, dz = c1x - vertex[0], c1y - vertex[1], c1z - vertex[2]
+        if np.sqrt(dx * dx + dy * dy + dz * dz) < eps:
+            c1x, c1y, c1z = vertex[0], vertex[1], vertex[2]
+            break
+
+    out[0, 0], out[0, 1], out[0, 2] = c1x, c1y, c1z
+    return 1
+
+
+@nb.njit(parallel=True, cache=True)
+def intersect_3d_linestrings(A, B, eps=EPS):
+    """
+    Determines the intersection points between the (N, 3) linestring A and
+    the (M, 3) linestring B by testing every pair of segments in 3D.
+
+    Points where the linestrings meet at a vertex are reported by each
+    segment pair touching it, so the result may contain duplicate rows.
+    """
+
+    n_a = max(len(A) - 1, 0)
+    n_b = max(len(B) - 1, 0)
+    counts = np.zeros(n_a, dtype=np.int64)
+
+    for i in nb.prange(n_a):
+        buf = np.empty((2, 3), dtype=np.float64)
+        for j in range(n_b):
+            counts[i] += _segment_intersection(A[i], A[i + 1], B[j], B[j + 1], eps, buf)
+
+    offsets = np.zeros(n_a + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)
+    intersection = np.empty((offsets[-1], 3), dtype=np.float64)
+
+    for i in nb.prange(n_a):
+        buf = np.empty((2, 3), dtype=np.float64)
+        idx = offsets[i]
+        for j in range(n_b):
+            n = _segment_intersection(A[i], A[i + 1], B[j], B[j + 1], eps, buf)
+            for k in range(n):
+                intersection[idx] = buf[k]
+                idx += 1
+
+    return intersection
+
+
+@nb.njit(parallel=True, cache=True)
+def intersect_3d_segment_pairs(A, B, idx_a, idx_b, eps=EPS):
+    """
+    Determines the intersection points between the segments
+    A[idx_a[k]]-A[idx_a[k] + 1] and B[idx_b[k]]-B[idx_b[k] + 1] for each
+    candidate pair k.
+    """
+
+    n_pairs = len(idx_a)
+    counts = np.zeros(n_pairs, dtype=np.int64)
+
+    for k in nb.prange(n_pairs):
+        buf = np.empty((2, 3), dtype=np.float64)
+        i, j = idx_a[k], idx_b[k]
+        counts[k] = _segment_intersection(A[i], A[i + 1], B[j], B[j + 1], eps, buf)
+
+    offsets = np.zeros(n_pairs + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)
+    intersection = np.empty((offsets[-1], 3), dtype=np.float64)
+
+    for k in nb.prange(n_pairs):
+        buf = np.empty((2, 3), dtype=np.float64)
+        i, j = idx_a[k], idx_b[k]
+        n = _segment_intersection(A[i], A[i + 1], B[j], B[j + 1], eps, buf)
+        for m in range(n):
+            intersection[offsets[k] + m] = buf[m]
+
+    return intersection
+
+
+@nb.njit(cache=True)
+def linestrings_intersect_3d(A, B, eps=EPS):
+    """
+    Determines if the (N, 3) linestring A and the (M, 3) linestring B
+    intersect, stopping at the first intersecting pair of segments.
+    """
+
+    buf = np.empty((2, 3), dtype=np.float64)
+    for i in range(len(A) - 1):
+        for j in range(len(B) - 1):
+            if _segment_intersection(A[i], A[i + 1], B[j], B[j + 1], eps, buf) > 0:
+                return True
+    return False
+
+
+@nb.njit(cache=True)
+def segment_pairs_intersect_3d(A, B, idx_a, idx_b, eps=EPS):
+    """
+    Determines if any of the candidate segment pairs
+    A[idx_a[k]]-A[idx_a[k] + 1] and B[idx_b[k]]-B[idx_b[k] + 1] intersect,
+    stopping at the first one that does.
+    """
+
+    buf = np.empty((2, 3), dtype=np.float64)
+    for k in range(len(idx_a)):
+        i, j = idx_a[k], idx_b[k]
+        if _segment_intersection(A[i], A[i + 1], B[j], B[j + 1], eps, buf) > 0:
+            return True
+    return False